@@ -1,7 +1,14 @@
 import numpy as np
 import sounddevice as sd
+from numba import get_num_threads, njit, prange
 from typing import Optional
 from enum import Enum
+import functools
+import itertools
+import os
+import queue
+import threading
+import wave
 
 
 class FilterType(Enum):
@@ -10,31 +17,473 @@ class FilterType(Enum):
     BANDPASS = "bandpass"
 
 
+# Sample format for every signal buffer in the graph. Time arrays stay float64
+# so phase stays accurate over long renders
+SAMPLE_DTYPE = np.float32
+
+
+# One cycle of sine, read back with linear interpolation instead of calling sin.
+# The table is a power of two long with the first sample repeated at the end,
+# so an interpolated read never has to wrap around
+_SINE_TABLE_SIZE = 4096
+_SINE_TABLE = np.sin(np.linspace(0, 2 * np.pi, _SINE_TABLE_SIZE + 1)).astype(
+    SAMPLE_DTYPE
+)
+_SINE_TABLE[-1] = _SINE_TABLE[0]
+_SINE_TABLE_SLOPE = np.append(np.diff(_SINE_TABLE), _SINE_TABLE[1] - _SINE_TABLE[0])
+
+
+@njit(inline="always")
+def _table_sine(cycles: float) -> float:
+    position = (cycles - np.floor(cycles)) * _SINE_TABLE_SIZE
+    index = int(position)
+    return _SINE_TABLE[index] + (position - index) * _SINE_TABLE_SLOPE[index]
+
+
+@njit(inline="always")
+def _square_wave(cycles: float, duty: float) -> float:
+    return 1.0 if cycles - np.floor(cycles) < duty else -1.0
+
+
+@njit(inline="always")
+def _triangle_wave(cycles: float) -> float:
+    # Closed form triangle, in phase with arcsin(sin(2*pi*cycles)) but with
+    # no transcendentals
+    cycles += 0.25
+    return 1.0 - 4.0 * np.abs(cycles - np.floor(cycles) - 0.5)
+
+
+# Oscillator kernels. Each starts from `phase` (in cycles) and advances it by
+# `increment` cycles per sample. The plain versions take scalar parameters and
+# evaluate every sample independently; the modulated versions take one value
+# per sample (float64 increments, SAMPLE_DTYPE amplitude and duty) and
+# accumulate the phase as they go, returning where it ended so the next buffer
+# carries on from there
+
+
+# A constant-frequency sine satisfies s[i + k] = 2 cos(k w) s[i] - s[i - k], so
+# it can be generated with one multiply-subtract per sample. The recurrence is
+# run as _ROTATOR_LANES interleaved lanes, which compile to SIMD, and reseeded
+# with exact sin values every _ROTATOR_CHUNK samples, which bounds the drift
+# and lets chunks render in parallel. The seeds are the chunk's start angle
+# shifted by each lane's offset, so they only take one sin and one cos given
+# the cos and sin of the offsets, which the oscillator keeps while its
+# frequency holds (see SineOscillator._lane_offsets)
+_ROTATOR_LANES = 32
+_ROTATOR_CHUNK = 1 << 14
+
+
+@njit(cache=True, nogil=True, fastmath=True, parallel=True)
+def _sine_kernel(
+    phase: float,
+    increment: float,
+    amplitude: float,
+    offsets: np.ndarray,
+    out: np.ndarray,
+):
+    """Constant-frequency sine.
+
+    offsets holds the cos (row 0) and sin (row 1) of k * 2 * pi * increment
+    for k from -_ROTATOR_LANES to _ROTATOR_LANES - 1.
+    """
+    lanes = _ROTATOR_LANES
+    twice_cos = 2 * offsets[0, 0]
+    for chunk in prange((out.size + _ROTATOR_CHUNK - 1) // _ROTATOR_CHUNK):
+        start = chunk * _ROTATOR_CHUNK
+        stop = min(start + _ROTATOR_CHUNK, out.size)
+        rows = (stop - start) // lanes
+
+        # Seed each lane with its first sample and the one a lane step before,
+        # by the angle addition formula from the chunk's start angle
+        cycles = phase + increment * start
+        angle = 2 * np.pi * (cycles - np.floor(cycles))
+        start_sin = amplitude * np.sin(angle)
+        start_cos = amplitude * np.cos(angle)
+        previous = np.empty(lanes)
+        current = np.empty(lanes)
+        for lane in range(lanes):
+            previous[lane] = start_sin * offsets[0, lane] + start_cos * offsets[1, lane]
+            current[lane] = (
+                start_sin * offsets[0, lanes + lane]
+                + start_cos * offsets[1, lanes + lane]
+            )
+
+        block = out[start : start + rows * lanes].reshape(rows, lanes)
+        for row in range(rows):
+            for lane in range(lanes):
+                block[row, lane] = current[lane]
+                following = twice_cos * current[lane] - previous[lane]
+                previous[lane] = current[lane]
+                current[lane] = following
+
+        for i in range(start + rows * lanes, stop):
+            out[i] = amplitude * _table_sine(phase + increment * i)
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def _sine_modulated_kernel(
+    phase: float, increment: np.ndarray, amplitude: np.ndarray, out: np.ndarray
+) -> float:
+    for i in range(out.size):
+        out[i] = amplitude[i] * _table_sine(phase)
+        phase += increment[i]
+        phase -= np.floor(phase)
+    return phase
+
+
+@njit(cache=True, nogil=True, fastmath=True, parallel=True)
+def _square_kernel(
+    phase: float, increment: float, amplitude: float, duty: float, out: np.ndarray
+):
+    for i in prange(out.size):
+        out[i] = amplitude * _square_wave(phase + increment * i, duty)
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def _square_modulated_kernel(
+    phase: float,
+    increment: np.ndarray,
+    amplitude: np.ndarray,
+    duty: np.ndarray,
+    out: np.ndarray,
+) -> float:
+    for i in range(out.size):
+        out[i] = amplitude[i] * _square_wave(phase, duty[i])
+        phase += increment[i]
+        phase -= np.floor(phase)
+    return phase
+
+
+@njit(cache=True, nogil=True, fastmath=True, parallel=True)
+def _triangle_kernel(phase: float, increment: float, amplitude: float, out: np.ndarray):
+    for i in prange(out.size):
+        out[i] = amplitude * _triangle_wave(phase + increment * i)
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def _triangle_modulated_kernel(
+    phase: float, increment: np.ndarray, amplitude: np.ndarray, out: np.ndarray
+) -> float:
+    for i in range(out.size):
+        out[i] = amplitude[i] * _triangle_wave(phase)
+        phase += increment[i]
+        phase -= np.floor(phase)
+    return phase
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def _lowpass_kernel(x: np.ndarray, alpha: float, y_prev: float, out: np.ndarray):
+    a1 = 1.0 - alpha
+    for i in range(x.size):
+        y_prev = alpha * x[i] + a1 * y_prev
+        out[i] = y_prev
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def _highpass_kernel(
+    x: np.ndarray, alpha: float, x_prev: float, y_prev: float, out: np.ndarray
+):
+    for i in range(x.size):
+        y_prev = alpha * (y_prev + x[i] - x_prev)
+        x_prev = x[i]
+        out[i] = y_prev
+
+
+@njit(cache=True, nogil=True, fastmath=True)
+def _biquad_kernel(
+    x: np.ndarray,
+    b0: float,
+    b1: float,
+    b2: float,
+    a1: float,
+    a2: float,
+    z1: float,
+    z2: float,
+    out: np.ndarray,
+):
+    """Direct form II transposed biquad, returning its state after the last sample"""
+    for i in range(x.size):
+        y = b0 * x[i] + z1
+        z1 = b1 * x[i] - a1 * y + z2
+        z2 = b2 * x[i] - a2 * y
+        out[i] = y
+    return z1, z2
+
+
+def _as_samples(signal: np.ndarray) -> np.ndarray:
+    """A module's output as a writable, contiguous SAMPLE_DTYPE array.
+
+    Kernels that take a tuple of signals only compile when every member has
+    the same array type, but a Module may return any float array, so outputs
+    from outside the built-in modules are converted first. Built-in outputs
+    already match and pass through without a copy.
+    """
+    signal = np.ascontiguousarray(signal, dtype=SAMPLE_DTYPE)
+    return signal if signal.flags.writeable else signal.copy()
+
+
+# Gain stage for a chain of VCAs: out = signal * scale * prod(control + 1), in
+# one pass however many control voltages the chain has
+@njit(cache=True, nogil=True, fastmath=True, parallel=True)
+def _vca_kernel(signal: np.ndarray, controls, scale: float, out: np.ndarray):
+    for i in prange(out.size):
+        gain = scale
+        for control in controls:
+            gain *= control[i] + 1
+        out[i] = signal[i] * gain
+
+
+# Weighted sum of the mixer inputs, reading each input in place in one pass
+@njit(cache=True, nogil=True, fastmath=True, parallel=True)
+def _mix_kernel(signals, gains: np.ndarray, out: np.ndarray):
+    for i in prange(out.size):
+        total = 0.0
+        for j in range(len(signals)):
+            total += gains[j] * signals[j][i]
+        out[i] = total
+
+
+# Buffers at least this long are filtered with the block-parallel scan below.
+# The scan does about twice the serial work, so it only pays off with more
+# than two threads to spread it over
+_PARALLEL_SCAN_MIN_SIZE = 1 << 16
+_PARALLEL_SCAN_BLOCK = 4096
+
+
+@njit(cache=True, nogil=True, fastmath=True, parallel=True)
+def _one_pole_scan_kernel(
+    x: np.ndarray,
+    gain: float,
+    pole: float,
+    differentiate: bool,
+    x_prev: float,
+    y_prev: float,
+    out: np.ndarray,
+):
+    """Solve y[i] = pole * y[i - 1] + gain * u[i] over blocks in parallel.
+
+    u is the input, or its first difference when differentiate is set (the
+    highpass form). Each block is first run from rest, then the state it
+    should have started from is added back in as pole ** k decay, so only
+    one multiply-add per block is left on the serial path.
+    """
+    n_blocks = (x.size + _PARALLEL_SCAN_BLOCK - 1) // _PARALLEL_SCAN_BLOCK
+
+    for block in prange(n_blocks):
+        start = block * _PARALLEL_SCAN_BLOCK
+        stop = min(start + _PARALLEL_SCAN_BLOCK, x.size)
+        previous = x[start - 1] if start > 0 else x_prev
+        y = 0.0
+        for i in range(start, stop):
+            u = x[i] - previous if differentiate else x[i]
+            previous = x[i]
+            y = pole * y + gain * u
+            out[i] = y
+
+    starts = np.empty(n_blocks)
+    for block in range(n_blocks):
+        start = block * _PARALLEL_SCAN_BLOCK
+        stop = min(start + _PARALLEL_SCAN_BLOCK, x.size)
+        starts[block] = y_prev
+        y_prev = out[stop - 1] + pole ** (stop - start) * y_prev
+
+    for block in prange(n_blocks):
+        start = block * _PARALLEL_SCAN_BLOCK
+        stop = min(start + _PARALLEL_SCAN_BLOCK, x.size)
+        decay = pole
+        for i in range(start, stop):
+            out[i] += decay * starts[block]
+            decay *= pole
+
+
+# Compile the kernels at import so the first buffer doesn't pay for the JIT
+_warmup_t = np.zeros(2)
+_warmup_x = np.zeros(2, dtype=SAMPLE_DTYPE)
+_sine_kernel(0.0, 0.1, 1.0, np.ones((2, 2 * _ROTATOR_LANES)), np.empty_like(_warmup_x))
+_square_kernel(0.0, 0.1, 1.0, 0.5, np.empty_like(_warmup_x))
+_triangle_kernel(0.0, 0.1, 1.0, np.empty_like(_warmup_x))
+_sine_modulated_kernel(0.0, _warmup_t, _warmup_x, np.empty_like(_warmup_x))
+_square_modulated_kernel(0.0, _warmup_t, _warmup_x, _warmup_x, np.empty_like(_warmup_x))
+_triangle_modulated_kernel(0.0, _warmup_t, _warmup_x, np.empty_like(_warmup_x))
+_vca_kernel(_warmup_x, (_warmup_x,), 0.5, np.empty_like(_warmup_x))
+_vca_kernel(_warmup_x, (_warmup_x, _warmup_x), 0.25, np.empty_like(_warmup_x))
+for _warmup_inputs in range(1, 5):
+    _mix_kernel(
+        (_warmup_x,) * _warmup_inputs,
+        np.ones(_warmup_inputs, dtype=SAMPLE_DTYPE),
+        np.empty_like(_warmup_x),
+    )
+_lowpass_kernel(_warmup_x, 0.5, 0.0, np.empty_like(_warmup_x))
+_highpass_kernel(_warmup_x, 0.5, 0.0, 0.0, np.empty_like(_warmup_x))
+_one_pole_scan_kernel(_warmup_x, 0.5, 0.5, False, 0.0, 0.0, np.empty_like(_warmup_x))
+_biquad_kernel(_warmup_x, 0.5, 0.0, -0.5, 0.0, 0.0, 0.0, 0.0, np.empty_like(_warmup_x))
+del _warmup_t, _warmup_x, _warmup_inputs
+
+
+# Source of ids for AudioOutput renders
+_render_ticks = itertools.count()
+# Id of the buffer being rendered on each thread. Unset outside of a render
+_render_state = threading.local()
+# Held while any graph renders. The parallel kernels may not be entered from
+# two threads at once under Numba's workqueue threading layer, so a render()
+# alongside a stream's producer thread takes turns with it
+_render_lock = threading.Lock()
+
+
+def _cached_per_tick(process):
+    """Reuse a module's output when several modules read it within one render"""
+
+    @functools.wraps(process)
+    def cached_process(self, time_array: np.ndarray) -> np.ndarray:
+        tick = getattr(_render_state, "tick", None)
+        if (
+            tick is not None
+            and tick == self._cache_tick
+            and time_array is self._cache_time
+        ):
+            return self._cache_output
+        output = process(self, time_array)
+        self._cache_tick = tick
+        self._cache_time = time_array
+        self._cache_output = output
+        return output
+
+    return cached_process
+
+
 class Module:
     def __init__(self):
         self.sample_rate = 44100  # Standard sample rate
         self.inputs = {}
         self.output = None
+        self._next_time = None  # Start time expected for the next buffer
+        self._buffers: dict[str, np.ndarray] = {}  # Reused output/scratch arrays
+        # Last output, shared with every reader in the same render tick
+        self._cache_tick = None
+        self._cache_time = None
+        self._cache_output = None
 
     def process(self, time_array: np.ndarray) -> np.ndarray:
         """Process the input and return output for the given time array"""
         raise NotImplementedError
 
+    def max_frequency(self) -> float:
+        """Upper bound on the frequencies in this module's output, in Hz.
+
+        inf when the output isn't band-limited or no bound is known.
+        """
+        return np.inf
+
+    def _buffer(self, name: str, size: int, dtype=SAMPLE_DTYPE) -> np.ndarray:
+        """Return a persistent array owned by this module, reallocated only on resize"""
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size != size:
+            buffer = np.empty(size, dtype=dtype)
+            self._buffers[name] = buffer
+        return buffer
+
+    def _per_sample(self, name: str, value, size: int, dtype=np.float64) -> np.ndarray:
+        """Spread a scalar or per-sample parameter over a scratch buffer"""
+        buffer = self._buffer(name, size, dtype)
+        buffer[...] = value
+        return buffer
+
+    @staticmethod
+    def _modulator(module: Optional["Module"]) -> Optional["Module"]:
+        """Check a modulation source can produce a sample array.
+
+        None disconnects the modulation, leaving the parameter a plain float
+        on the scalar kernel path. Anything else needs a process() method
+        returning one sample per time, but need not subclass Module.
+        """
+        if module is not None and not callable(getattr(module, "process", None)):
+            raise TypeError(
+                "Modulation source must have a process() method, "
+                f"got {type(module).__name__}"
+            )
+        return module
+
+    @staticmethod
+    def _max_frequency_of(source) -> float:
+        """A modulation source's max_frequency(), or unknown if it has none"""
+        max_frequency = getattr(source, "max_frequency", None)
+        return max_frequency() if max_frequency else np.inf
+
+    def _advance_clock(self, time_array: np.ndarray) -> bool:
+        """Report whether time_array follows on from the previous buffer"""
+        if time_array.size == 0:
+            return False
+        continues = (
+            self._next_time is not None
+            and abs(time_array[0] - self._next_time) < 0.5 / self.sample_rate
+        )
+        self._next_time = time_array[-1] + 1 / self.sample_rate
+        return continues
+
+
+class Oscillator(Module):
+    """Base for oscillators, which keep a running phase between buffers."""
+
+    def __init__(self):
+        super().__init__()
+        self._phase = 0.0  # Position within the current cycle, in [0, 1)
+
+    def _start_phase(self, frequency, time_array: np.ndarray) -> float:
+        """Phase at the start of time_array.
+
+        A buffer that follows on from the previous one continues its phase, so
+        frequency changes never cause a discontinuity. A new render starts from
+        the phase implied by its start time.
+        """
+        if not self._advance_clock(time_array):
+            start_frequency = frequency if np.isscalar(frequency) else frequency[0]
+            self._phase = (start_frequency * time_array[0]) % 1.0
+        return self._phase
+
+    def _increments(self, frequency, size: int) -> np.ndarray:
+        """Per-sample phase increments, in cycles, for the given frequency"""
+        increments = self._per_sample("increment", frequency, size)
+        increments /= self.sample_rate
+        return increments
 
-class SineOscillator(Module):
+
+class SineOscillator(Oscillator):
     def __init__(self, frequency: float = 440.0, amplitude: float = 1.0):
         super().__init__()
         self.base_frequency = frequency
         self.base_amplitude = amplitude
         self.freq_mod_input = None
         self.amp_mod_input = None
-
-    def set_frequency_modulation(self, module: Module):
-        self.freq_mod_input = module
-
-    def set_amplitude_modulation(self, module: Module):
-        self.amp_mod_input = module
-
+        # Lane offsets for _sine_kernel and the increment they were built for
+        self._offsets = None
+        self._offsets_increment = None
+
+    def set_frequency_modulation(self, module: Optional[Module]):
+        self.freq_mod_input = self._modulator(module)
+
+    def set_amplitude_modulation(self, module: Optional[Module]):
+        self.amp_mod_input = self._modulator(module)
+
+    def max_frequency(self) -> float:
+        if self.freq_mod_input or not np.isscalar(self.base_frequency):
+            return np.inf
+        # Unmodulated, the frequency is base_frequency * (1 + 1.0). Amplitude
+        # modulation adds sidebands as far out as the modulator's own content
+        frequency = abs(self.base_frequency) * 2
+        if self.amp_mod_input:
+            frequency += self._max_frequency_of(self.amp_mod_input)
+        return frequency
+
+    def _lane_offsets(self, increment: float) -> np.ndarray:
+        """cos and sin of the rotator lane offsets, kept while the frequency holds"""
+        if increment != self._offsets_increment:
+            lanes = np.arange(-_ROTATOR_LANES, _ROTATOR_LANES)
+            angles = 2 * np.pi * increment * lanes
+            self._offsets = np.stack((np.cos(angles), np.sin(angles)))
+            self._offsets_increment = increment
+        return self._offsets
+
+    @_cached_per_tick
     def process(self, time_array: np.ndarray) -> np.ndarray:
         # Get modulation values if connected
         freq_mod = 1.0
@@ -49,10 +498,27 @@ class SineOscillator(Module):
         frequency = self.base_frequency * (1 + freq_mod)
         amplitude = self.base_amplitude * amp_mod
 
-        return amplitude * np.sin(2 * np.pi * frequency * time_array)
+        sine = self._buffer("out", time_array.size)
+        if not time_array.size:
+            return sine
+        phase = self._start_phase(frequency, time_array)
+        if np.isscalar(frequency) and np.isscalar(amplitude):
+            increment = frequency / self.sample_rate
+            _sine_kernel(
+                phase, increment, amplitude, self._lane_offsets(increment), sine
+            )
+            self._phase = (phase + increment * sine.size) % 1.0
+        else:
+            self._phase = _sine_modulated_kernel(
+                phase,
+                self._increments(frequency, time_array.size),
+                self._per_sample("amplitude", amplitude, time_array.size, SAMPLE_DTYPE),
+                sine,
+            )
+        return sine
 
 
-class SquareOscillator(Module):
+class SquareOscillator(Oscillator):
     def __init__(
         self, frequency: float = 440.0, amplitude: float = 1.0, duty_cycle: float = 0.5
     ):
@@ -64,15 +530,16 @@ class SquareOscillator(Module):
         self.amp_mod_input = None
         self.duty_mod_input = None
 
-    def set_frequency_modulation(self, module: Module):
-        self.freq_mod_input = module
+    def set_frequency_modulation(self, module: Optional[Module]):
+        self.freq_mod_input = self._modulator(module)
 
-    def set_amplitude_modulation(self, module: Module):
-        self.amp_mod_input = module
+    def set_amplitude_modulation(self, module: Optional[Module]):
+        self.amp_mod_input = self._modulator(module)
 
-    def set_duty_cycle_modulation(self, module: Module):
-        self.duty_mod_input = module
+    def set_duty_cycle_modulation(self, module: Optional[Module]):
+        self.duty_mod_input = self._modulator(module)
 
+    @_cached_per_tick
     def process(self, time_array: np.ndarray) -> np.ndarray:
         freq_mod = 1.0
         amp_mod = 1.0
@@ -89,13 +556,26 @@ class SquareOscillator(Module):
         amplitude = self.base_amplitude * amp_mod
         duty = np.clip(self.duty_cycle + duty_mod, 0.0, 1.0)
 
-        # Generate square wave using sign of sine wave and duty cycle
-        phase = 2 * np.pi * frequency * time_array
-        square = np.where(np.mod(phase, 2 * np.pi) / (2 * np.pi) < duty, 1.0, -1.0)
-        return amplitude * square
+        square = self._buffer("out", time_array.size)
+        if not time_array.size:
+            return square
+        phase = self._start_phase(frequency, time_array)
+        if np.isscalar(frequency) and np.isscalar(amplitude) and np.isscalar(duty):
+            increment = frequency / self.sample_rate
+            _square_kernel(phase, increment, amplitude, duty, square)
+            self._phase = (phase + increment * square.size) % 1.0
+        else:
+            self._phase = _square_modulated_kernel(
+                phase,
+                self._increments(frequency, time_array.size),
+                self._per_sample("amplitude", amplitude, time_array.size, SAMPLE_DTYPE),
+                self._per_sample("duty", duty, time_array.size, SAMPLE_DTYPE),
+                square,
+            )
+        return square
 
 
-class TriangleOscillator(Module):
+class TriangleOscillator(Oscillator):
     def __init__(self, frequency: float = 440.0, amplitude: float = 1.0):
         super().__init__()
         self.base_frequency = frequency
@@ -103,12 +583,13 @@ class TriangleOscillator(Module):
         self.freq_mod_input = None
         self.amp_mod_input = None
 
-    def set_frequency_modulation(self, module: Module):
-        self.freq_mod_input = module
+    def set_frequency_modulation(self, module: Optional[Module]):
+        self.freq_mod_input = self._modulator(module)
 
-    def set_amplitude_modulation(self, module: Module):
-        self.amp_mod_input = module
+    def set_amplitude_modulation(self, module: Optional[Module]):
+        self.amp_mod_input = self._modulator(module)
 
+    @_cached_per_tick
     def process(self, time_array: np.ndarray) -> np.ndarray:
         freq_mod = 1.0
         amp_mod = 1.0
@@ -121,10 +602,22 @@ class TriangleOscillator(Module):
         frequency = self.base_frequency * (1 + freq_mod)
         amplitude = self.base_amplitude * amp_mod
 
-        # Generate triangle wave using arcsin of sine wave
-        phase = 2 * np.pi * frequency * time_array
-        triangle = (2 / np.pi) * np.arcsin(np.sin(phase))
-        return amplitude * triangle
+        triangle = self._buffer("out", time_array.size)
+        if not time_array.size:
+            return triangle
+        phase = self._start_phase(frequency, time_array)
+        if np.isscalar(frequency) and np.isscalar(amplitude):
+            increment = frequency / self.sample_rate
+            _triangle_kernel(phase, increment, amplitude, triangle)
+            self._phase = (phase + increment * triangle.size) % 1.0
+        else:
+            self._phase = _triangle_modulated_kernel(
+                phase,
+                self._increments(frequency, time_array.size),
+                self._per_sample("amplitude", amplitude, time_array.size, SAMPLE_DTYPE),
+                triangle,
+            )
+        return triangle
 
 
 class VCA(Module):
@@ -140,27 +633,53 @@ class VCA(Module):
         self.input_module = module
 
     def set_cv_input(self, module: Module):
-        self.cv_input = module
+        self.cv_input = self._modulator(module)
 
-    def process(self, time_array: np.ndarray) -> np.ndarray:
+    def max_frequency(self) -> float:
         if not self.input_module:
-            return np.zeros_like(time_array)
-
-        input_signal = self.input_module.process(time_array)
-
-        # Get CV (control voltage) signal, default to 1.0 if no CV input
+            return 0.0
+        frequency = self.input_module.max_frequency()
         if self.cv_input:
-            # Normalize CV to [0, 1] range and apply as gain
-            cv_signal = self.cv_input.process(time_array)
-            cv_signal = (cv_signal + 1) * 0.5  # Convert from [-1, 1] to [0, 1]
-            gain = cv_signal * self.base_gain
-        else:
-            gain = self.base_gain
+            frequency += self._max_frequency_of(self.cv_input)  # Sidebands, as above
+        return frequency
 
-        return input_signal * gain
+    @_cached_per_tick
+    def process(self, time_array: np.ndarray) -> np.ndarray:
+        output = self._buffer("out", time_array.size)
+
+        # VCAs feeding straight into this one are applied in the same pass, so
+        # a cascade never writes its intermediate signals out
+        vca = self
+        scale = 1.0
+        controls = []
+        while True:
+            scale *= vca.base_gain
+            if vca.cv_input:
+                # CV in [-1, 1] becomes a gain in [0, 1]: (cv + 1) * 0.5
+                controls.append(_as_samples(vca.cv_input.process(time_array)))
+                scale *= 0.5
+            if not isinstance(vca.input_module, VCA):
+                break
+            vca = vca.input_module
+
+        if not vca.input_module:
+            output.fill(0.0)
+            return output
+
+        input_signal = vca.input_module.process(time_array)
+        if controls:
+            _vca_kernel(input_signal, tuple(controls), scale, output)
+        else:
+            np.multiply(input_signal, scale, out=output)
+        return output
 
 
 class Filter(Module):
+    # A one-pole lowpass changes nothing below a tenth of its cutoff by more
+    # than 0.05 dB in level or 6 degrees in phase, so when the whole input
+    # lies that low the filter passes it straight through
+    bypass_ratio = 10
+
     def __init__(
         self, filter_type: FilterType = FilterType.LOWPASS, cutoff_freq: float = 1000
     ):
@@ -169,13 +688,26 @@ class Filter(Module):
         self.cutoff_freq = cutoff_freq
         self.input_module = None
         self.resonance = 1.0  # Q factor
+        # Last input/output samples, carried over so streamed buffers join smoothly
+        self._x_prev = 0.0
+        self._y_prev = 0.0
+        # Bandpass biquad state, carried over the same way
+        self._z1 = 0.0
+        self._z2 = 0.0
 
     def set_input(self, module: Module):
         self.input_module = module
 
+    def max_frequency(self) -> float:
+        # Filtering only ever takes frequencies away
+        return self.input_module.max_frequency() if self.input_module else 0.0
+
+    @_cached_per_tick
     def process(self, time_array: np.ndarray) -> np.ndarray:
+        filtered = self._buffer("out", time_array.size)
         if not self.input_module:
-            return np.zeros_like(time_array)
+            filtered.fill(0.0)
+            return filtered
 
         input_signal = self.input_module.process(time_array)
 
@@ -183,17 +715,59 @@ class Filter(Module):
         dt = 1 / self.sample_rate
         alpha = dt / (1 / (2 * np.pi * self.cutoff_freq) + dt)
 
-        filtered = np.zeros_like(input_signal)
-        filtered[0] = input_signal[0]
-
-        if self.filter_type == FilterType.LOWPASS:
-            for i in range(1, len(input_signal)):
-                filtered[i] = alpha * input_signal[i] + (1 - alpha) * filtered[i - 1]
+        # Bandpass coefficients (RBJ cookbook, 0 dB peak gain at the cutoff)
+        w0 = 2 * np.pi * self.cutoff_freq / self.sample_rate
+        bandwidth = np.sin(w0) / (2 * self.resonance)
+        b0 = bandwidth / (1 + bandwidth)
+        a1 = -2 * np.cos(w0) / (1 + bandwidth)
+        a2 = (1 - bandwidth) / (1 + bandwidth)
+
+        # Start a new render from the steady state for its first sample
+        if not self._advance_clock(time_array) and input_signal.size:
+            self._x_prev = self._y_prev = float(input_signal[0])
+            if self.filter_type == FilterType.HIGHPASS:
+                self._y_prev = 0.0
+            # The bandpass blocks DC, so a constant input settles at zero output
+            self._z1 = self._z2 = -b0 * self._x_prev
+
+        if (
+            self.filter_type == FilterType.LOWPASS
+            and self.input_module.max_frequency() * self.bypass_ratio
+            <= self.cutoff_freq
+        ):
+            if input_signal.size:
+                # Settled on the input, ready for if the bypass stops applying
+                self._x_prev = self._y_prev = float(input_signal[-1])
+            return input_signal
+
+        if (
+            self.filter_type in (FilterType.LOWPASS, FilterType.HIGHPASS)
+            and input_signal.size >= _PARALLEL_SCAN_MIN_SIZE
+            and get_num_threads() > 2
+        ):
+            # Long offline renders: split the recurrence across cores
+            highpass = self.filter_type == FilterType.HIGHPASS
+            _one_pole_scan_kernel(
+                input_signal,
+                alpha,
+                alpha if highpass else 1.0 - alpha,
+                highpass,
+                self._x_prev,
+                self._y_prev,
+                filtered,
+            )
+        elif self.filter_type == FilterType.LOWPASS:
+            _lowpass_kernel(input_signal, alpha, self._y_prev, filtered)
         elif self.filter_type == FilterType.HIGHPASS:
-            for i in range(1, len(input_signal)):
-                filtered[i] = alpha * (
-                    filtered[i - 1] + input_signal[i] - input_signal[i - 1]
-                )
+            _highpass_kernel(input_signal, alpha, self._x_prev, self._y_prev, filtered)
+        else:
+            self._z1, self._z2 = _biquad_kernel(
+                input_signal, b0, 0.0, -b0, a1, a2, self._z1, self._z2, filtered
+            )
+
+        if input_signal.size:
+            self._x_prev = float(input_signal[-1])
+            self._y_prev = float(filtered[-1])
 
         return filtered
 
@@ -202,23 +776,37 @@ class Mixer(Module):
     def __init__(self):
         super().__init__()
         self.input_modules: list[tuple[Module, float]] = []  # (module, gain) pairs
+        self._gains = np.empty(0, dtype=SAMPLE_DTYPE)  # Normalized input gains
+        self._processes = ()  # Bound process method of each input, in order
 
     def add_input(self, module: Module, gain: float = 1.0):
         self.input_modules.append((module, gain))
+        self._processes += (module.process,)
+
+        # Normalize to prevent clipping by scaling the gains up front, rather
+        # than searching every buffer for its peak and dividing afterwards
+        gains = np.array([gain for _, gain in self.input_modules])
+        gains /= max(1.0, np.abs(gains).sum())
+        self._gains = gains.astype(SAMPLE_DTYPE)
 
+    def max_frequency(self) -> float:
+        return max(
+            (module.max_frequency() for module, _ in self.input_modules), default=0.0
+        )
+
+    @_cached_per_tick
     def process(self, time_array: np.ndarray) -> np.ndarray:
+        output = self._buffer("out", time_array.size)
         if not self.input_modules:
-            return np.zeros_like(time_array)
-
-        # Mix all inputs with their respective gains
-        output = np.zeros_like(time_array)
-        for module, gain in self.input_modules:
-            output += gain * module.process(time_array)
+            output.fill(0.0)
+            return output
 
-        # Normalize to prevent clipping
-        max_val = np.max(np.abs(output))
-        if max_val > 1.0:
-            output /= max_val
+        # Mix straight from each input's own buffer, without gathering them
+        # into one array first
+        signals = tuple(
+            _as_samples(process(time_array)) for process in self._processes
+        )
+        _mix_kernel(signals, self._gains, output)
 
         return output
 
@@ -242,6 +830,18 @@ class Sequencer(Module):
         "B": 493.88,
     }
 
+    # Frequency of every note name add_note accepts, octaves 0-9 (A4 = 440 Hz)
+    ALL_NOTES = {
+        f"{note}{octave}": frequency * (2 ** (octave - 4))
+        for note, frequency in NOTE_FREQUENCIES.items()
+        for octave in range(10)
+    }
+
+    # Frequency of every MIDI note number in the same tuning (60 = C4, 69 = A4)
+    MIDI_FREQUENCIES = np.array(list(NOTE_FREQUENCIES.values()))[
+        np.arange(128) % 12
+    ] * 2.0 ** (np.arange(128) // 12 - 5)
+
     def __init__(self, bpm=120.0):
         """Initialize the sequencer.
 
@@ -253,6 +853,10 @@ class Sequencer(Module):
         self.step_duration = 60.0 / bpm  # Duration of one beat in seconds
         self.sequence = []  # List of (frequency, duration) tuples
         self.output_module = None
+        # Note start times and frequencies as arrays, see _note_table
+        self._note_table_key = None
+        self._note_starts = None
+        self._note_frequencies = None
 
     def set_output(self, module):
         """Set the output module that will receive the sequence."""
@@ -265,17 +869,20 @@ class Sequencer(Module):
             note_name (str): Note name (e.g., 'C4', 'A#3')
             duration (float): Duration in beats
         """
-        # Parse note name (e.g., 'C4' -> 'C' and 4)
-        note = note_name[:-1]
-        octave = int(note_name[-1])
+        self.sequence.append((self.ALL_NOTES[note_name], duration))
 
-        # Calculate frequency based on octave
-        base_freq = self.NOTE_FREQUENCIES[note]
-        frequency = base_freq * (2 ** (octave - 4))  # A4 is our reference octave
+    def add_midi_note(self, note_number, duration):
+        """Add a note to the sequence by MIDI note number.
 
-        # Add to sequence
-        self.sequence.append((frequency, duration))
+        Args:
+            note_number (int): MIDI note number, 0-127 (e.g., 60 for C4)
+            duration (float): Duration in beats
+        """
+        if not 0 <= note_number < len(self.MIDI_FREQUENCIES):
+            raise ValueError(f"MIDI note number must be 0-127, got {note_number}")
+        self.sequence.append((float(self.MIDI_FREQUENCIES[note_number]), duration))
 
+    @_cached_per_tick
     def process(self, t):
         """Process the sequence for the given time array.
 
@@ -285,69 +892,131 @@ class Sequencer(Module):
         Returns:
             np.ndarray: Output signal
         """
-        if not self.output_module:
-            return np.zeros_like(t)
+        # Initialize output array
+        output = self._buffer("out", t.size)
+        output.fill(0.0)
+        if not self.output_module or not self.sequence:
+            return output
+
+        starts, frequencies = self._note_table()
+
+        # Note k covers the contiguous run t[bounds[k]:bounds[k + 1]]
+        bounds = np.searchsorted(t, starts)
+
+        # Per-sample frequency and amplitude envelope, written one slice per
+        # note heard in this buffer. Outside the sequence the envelope is
+        # silent and the frequency holds at the first or last note
+        note_frequency = self._buffer("frequency", t.size, np.float64)
+        note_frequency[: bounds[0]] = frequencies[0]
+        note_frequency[bounds[-1] :] = frequencies[-1]
+        envelope = self._buffer("envelope", t.size)
+        envelope.fill(0.0)
+        for k in np.flatnonzero(bounds[1:] > bounds[:-1]):
+            note = slice(bounds[k], bounds[k + 1])
+            note_frequency[note] = frequencies[k]
+            note_envelope = envelope[note]
+            np.subtract(t[note], starts[k], out=note_envelope)
+            note_envelope *= -10.0  # 1 / 0.1 s decay constant
+            np.exp(note_envelope, out=note_envelope)  # Quick attack, natural decay
+
+        # Drive the oscillators with a per-sample frequency so the whole buffer
+        # is rendered in one pass instead of once per note
+        oscillators = self._oscillators()
+        previous = [oscillator.base_frequency for oscillator in oscillators]
+        for oscillator in oscillators:
+            oscillator.base_frequency = note_frequency
+        try:
+            np.multiply(self.output_module.process(t), envelope, out=output)
+        finally:
+            for oscillator, frequency in zip(oscillators, previous):
+                oscillator.base_frequency = frequency
 
-        # Calculate total sequence duration
-        total_duration = sum(
-            duration * self.step_duration for _, duration in self.sequence
-        )
+        return output
 
-        # Initialize output array
-        output = np.zeros_like(t)
-
-        # Current time in sequence
-        current_time = 0
-
-        # Process each note
-        for frequency, duration in self.sequence:
-            note_duration = duration * self.step_duration
-
-            # Find indices for this note
-            note_start = current_time
-            note_end = current_time + note_duration
-
-            # Get the time indices for this note
-            note_indices = (t >= note_start) & (t < note_end)
-
-            if np.any(note_indices):
-                # Set frequency for this note
-                if isinstance(
-                    self.output_module,
-                    (SineOscillator, SquareOscillator, TriangleOscillator),
-                ):
-                    self.output_module.base_frequency = frequency
-                elif hasattr(self.output_module, "input_modules"):
-                    # If it's a mixer, update all input oscillators
-                    for module, _ in self.output_module.input_modules:
-                        if isinstance(
-                            module,
-                            (SineOscillator, SquareOscillator, TriangleOscillator),
-                        ):
-                            module.base_frequency = frequency
-
-                # Process the note
-                note_output = self.output_module.process(t[note_indices])
-
-                # Apply amplitude envelope
-                note_time = t[note_indices] - note_start
-                envelope = np.exp(-note_time / 0.1)  # Quick attack, natural decay
-                note_output = note_output * envelope
-
-                # Add to output
-                output[note_indices] = note_output
-
-            current_time += note_duration
+    def _note_table(self):
+        """Note boundaries in seconds and note frequencies, as arrays.
+
+        Note k plays from starts[k] to starts[k + 1]. The arrays are rebuilt
+        only when the notes or the tempo change, not on every buffer. The key
+        is a snapshot of the sequence's contents, so notes edited in place in
+        self.sequence are picked up as well as ones added through add_*.
+        """
+        key = (tuple(self.sequence), self.step_duration)
+        if key != self._note_table_key:
+            durations = np.array([duration for _, duration in self.sequence])
+            self._note_starts = np.concatenate(
+                ([0.0], np.cumsum(durations * self.step_duration))
+            )
+            self._note_frequencies = np.array(
+                [frequency for frequency, _ in self.sequence]
+            )
+            self._note_table_key = key
+        return self._note_starts, self._note_frequencies
+
+    def _oscillators(self):
+        """The oscillators whose frequency follows the sequence."""
+        if isinstance(self.output_module, Oscillator):
+            return [self.output_module]
+        if hasattr(self.output_module, "input_modules"):
+            # If it's a mixer, update all input oscillators
+            return [
+                module
+                for module, _ in self.output_module.input_modules
+                if isinstance(module, Oscillator)
+            ]
+        return []
+
+
+class BufferSource(Module):
+    """Plays back a precomputed sample array, silent before and after it."""
+
+    def __init__(self, samples: np.ndarray):
+        super().__init__()
+        self.samples = np.ascontiguousarray(samples, dtype=SAMPLE_DTYPE).ravel()
 
+    @_cached_per_tick
+    def process(self, time_array: np.ndarray) -> np.ndarray:
+        output = self._buffer("out", time_array.size)
+        output.fill(0.0)
+        if not time_array.size:
+            return output
+
+        # Time arrays advance one sample per element, so each buffer reads a
+        # single contiguous run of the stored samples
+        start = int(round(time_array[0] * self.sample_rate))
+        first = max(0, -start)
+        last = min(time_array.size, self.samples.size - start)
+        if last > first:
+            output[first:last] = self.samples[start + first : start + last]
         return output
 
 
 class AudioOutput:
-    def __init__(self, input_module: Optional[Module] = None):
+    # Samples per graph walk in render(). Long enough that walking the graph in
+    # Python costs next to nothing per sample, short enough that each module's
+    # buffer (256 KB of float32) stays in cache between producer and consumer
+    render_block_size = 1 << 16
+    # Blocks a stream renders ahead of the device. A block that takes longer
+    # than a callback period to render eats into this slack rather than
+    # causing an underrun; each block adds block_size frames of latency
+    queue_blocks = 4
+
+    def __init__(self, input_module: Optional[Module] = None, block_size: int = 1024):
         self.sample_rate = 44100
         self.input_module = input_module
+        # Frames per streaming callback. The graph is walked in Python once per
+        # callback, so larger blocks spread that cost over more samples at the
+        # expense of latency (1024 frames is ~23 ms at 44.1 kHz)
+        self.block_size = block_size
         self.is_playing = False
         self.stream = None
+        self._producer = None  # Thread rendering blocks ahead of the stream
+        self._producing = threading.Event()
+
+    @classmethod
+    def from_buffer(cls, samples: np.ndarray, block_size: int = 1024):
+        """Output that plays back an already rendered sample array"""
+        return cls(BufferSource(samples), block_size)
 
     def set_input(self, module: Module):
         self.input_module = module
@@ -357,52 +1026,130 @@ class AudioOutput:
             raise ValueError("No input module connected")
 
         if duration == 0:
-            # Run indefinitely
+            # Run indefinitely. A producer thread renders blocks into a bounded
+            # queue and the callback only copies them out, so DSP runs ahead of
+            # playback instead of inside the device's deadline
+            blocks = queue.Queue(maxsize=self.queue_blocks)
+            # Rendered blocks are written round-robin into these slots. With
+            # two more than the queue holds, the slot being written is never
+            # one that is queued or still being played
+            slots = np.empty(
+                (self.queue_blocks + 2, self.block_size), dtype=SAMPLE_DTYPE
+            )
+            t_base = np.arange(self.block_size) / self.sample_rate
+            t_scratch = np.empty(self.block_size)
+
+            def produce():
+                for slot in itertools.cycle(slots):
+                    t = np.add(t_base, self.current_time, out=t_scratch)
+                    slot[:] = self._render(t)
+                    self.current_time += self.block_size / self.sample_rate
+                    while self._producing.is_set():
+                        try:
+                            blocks.put(slot, timeout=0.1)
+                            break
+                        except queue.Full:
+                            pass
+                    else:
+                        return
+
+            pending = slots[0, :0]  # Unplayed remainder of the current block
+
             def callback(outdata, frames, time, status):
+                nonlocal pending
                 if status:
                     print(status)
-                if self.input_module:  # Add type check
-                    t = np.arange(frames) / self.sample_rate + self.current_time
-                    outdata[:] = self.input_module.process(t).reshape(-1, 1)
-                    self.current_time += frames / self.sample_rate
+                filled = 0
+                while filled < frames:
+                    if not pending.size:
+                        try:
+                            pending = blocks.get_nowait()
+                        except queue.Empty:
+                            outdata[filled:] = 0  # Producer fell behind
+                            return
+                    count = min(frames - filled, pending.size)
+                    outdata[filled : filled + count, 0] = pending[:count]
+                    pending = pending[count:]
+                    filled += count
 
             self.current_time = 0
-            self.stream = sd.OutputStream(
-                channels=1, callback=callback, samplerate=self.sample_rate
-            )
-            self.stream.start()
+            self._producing.set()
+            self._producer = threading.Thread(target=produce, daemon=True)
+            self._producer.start()
+            try:
+                self.stream = sd.OutputStream(
+                    channels=1,
+                    callback=callback,
+                    samplerate=self.sample_rate,
+                    blocksize=self.block_size,
+                    # Hand the device the graph's own sample format so blocks
+                    # are copied into the stream without conversion
+                    dtype=np.dtype(SAMPLE_DTYPE).name,
+                )
+                self.stream.start()
+            except BaseException:
+                # No stream to stop() later, so don't leave the producer running
+                self.stop()
+                raise
         else:
             # Play for specified duration
-            t = np.arange(int(duration * self.sample_rate)) / self.sample_rate
-            if self.input_module:  # Add type check
-                audio_data = self.input_module.process(t)
-                sd.play(audio_data, self.sample_rate)
-                sd.wait()
+            sd.play(self.render(duration), self.sample_rate)
+            sd.wait()
+
+    def render(self, duration: float) -> np.ndarray:
+        """Render `duration` seconds of the input module without playing it.
+
+        The span is rendered in consecutive blocks of render_block_size
+        samples. Modules carry their state from one block to the next, so the
+        result is the same as rendering it in one go.
+        """
+        if not self.input_module:
+            raise ValueError("No input module connected")
+        t = np.arange(int(duration * self.sample_rate)) / self.sample_rate
+        audio_data = np.empty(t.size, dtype=SAMPLE_DTYPE)
+        for start in range(0, t.size, self.render_block_size):
+            block = slice(start, start + self.render_block_size)
+            audio_data[block] = self._render(t[block])
+        return audio_data
+
+    def render_to_wav(self, path, duration: float):
+        """Render `duration` seconds of the input module to a 16-bit mono WAV file.
+
+        Like render(), this runs as fast as the graph can be evaluated rather
+        than at playback speed.
+        """
+        audio_data = self.render(duration)
+        pcm = np.rint(np.clip(audio_data, -1.0, 1.0) * 32767).astype("<i2")
+        with wave.open(os.fspath(path), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(pcm.tobytes())
+
+    def _render(self, time_array: np.ndarray) -> np.ndarray:
+        """Run the graph over one buffer as a single render tick"""
+        with _render_lock:
+            _render_state.tick = next(_render_ticks)
+            try:
+                return self.input_module.process(time_array)
+            finally:
+                _render_state.tick = None
 
     def stop(self):
         if self.stream:
             self.stream.stop()
             self.stream.close()
             self.stream = None
+        if self._producer:
+            self._producing.clear()
+            self._producer.join()
+            self._producer = None
 
 
-# Example usage:
+# Example usage: python bleeps.py [example number ...], see examples.EXAMPLES
 if __name__ == "__main__":
-    from examples import (
-        example_1_waveforms,
-        example_2_chord,
-        example_3_vca,
-        example_4_beeper,
-        example_5_morse_code,
-        example_6_drum_and_lead,
-        example_7_sequencer,
-    )
+    import sys
+
+    from examples import main
 
-    # Uncomment the examples you want to run
-    # example_1_waveforms()
-    # example_2_chord()
-    # example_3_vca()
-    # example_4_beeper()
-    # example_5_morse_code()
-    # example_6_drum_and_lead()
-    example_7_sequencer()
+    main(sys.argv[1:])
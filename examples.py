@@ -1,3 +1,12 @@
+import argparse
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import bleeps
 from bleeps import (
     SineOscillator,
     SquareOscillator,
@@ -10,8 +19,56 @@ from bleeps import (
     Sequencer,
 )
 
+# Renders of examples whose output never changes, kept between runs
+CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "bleeps"
+)
 
-def example_1_waveforms():
+
+def cached_render(name: str, output: AudioOutput, duration: float) -> np.ndarray:
+    """Render `output`, or load the copy saved by an earlier run.
+
+    The cache file is keyed on the bleeps and examples sources, so editing
+    either one renders afresh instead of replaying stale audio.
+    """
+    sources = hashlib.sha256()
+    for source in (Path(bleeps.__file__), Path(__file__)):
+        sources.update(source.read_bytes())
+    path = CACHE_DIR / f"{name}-{duration:g}s-{sources.hexdigest()[:16]}.npy"
+    if path.exists():
+        return np.load(path, mmap_mode="r")
+
+    samples = output.render(duration)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Written under a name of its own, so runs saving at once never collide
+    partial = path.with_suffix(f".{os.getpid()}.partial.npy")
+    np.save(partial, samples)
+    partial.replace(path)  # Never leave a half-written file under the real name
+    # Renders keyed on older sources can never be hit again. Other runs' files
+    # still being written are left to them
+    for stale in CACHE_DIR.glob(f"{name}-{duration:g}s-*.npy"):
+        if stale != path and not stale.name.endswith(".partial.npy"):
+            stale.unlink(missing_ok=True)
+    return samples
+
+
+def announce(description: str, wav_path=None):
+    """Say what an example is about to do, whether it plays or writes a file"""
+    if wav_path is None:
+        print(f"Playing {description}...")
+    else:
+        print(f"Writing {description} to {wav_path}...")
+
+
+def play(output: AudioOutput, duration: float, wav_path=None):
+    """Play `duration` seconds of output, or write them to wav_path instead"""
+    if wav_path is None:
+        output.start(duration=duration)
+    else:
+        output.render_to_wav(wav_path, duration)
+
+
+def example_1_waveforms(wav_path=None):
     """Demonstrate basic waveforms with different modulation types."""
     # Create base oscillators at different frequencies
     sine = SineOscillator(frequency=440)  # A4 note
@@ -44,14 +101,14 @@ def example_1_waveforms():
     output = AudioOutput(filter_module)
 
     # Play for 10 seconds
-    print("Playing demonstration of sine, square, and triangle waves...")
+    announce("demonstration of sine, square, and triangle waves", wav_path)
     print("- Sine wave (440 Hz) with tremolo effect")
     print("- Square wave (220 Hz) with pulse width modulation")
     print("- Triangle wave (110 Hz) with vibrato effect")
-    output.start(duration=10)
+    play(output, 10, wav_path)
 
 
-def example_2_chord():
+def example_2_chord(wav_path=None):
     """Demonstrate a major chord with evolving texture."""
     # Create a C major chord (C4-E4-G4) with different waveforms
     root = SineOscillator(frequency=261.63)  # C4 - fundamental
@@ -82,14 +139,14 @@ def example_2_chord():
     # Create audio output
     chord_output = AudioOutput(chord_filter)
 
-    print("Playing C major chord with evolving texture...")
+    announce("C major chord with evolving texture", wav_path)
     print("- C4 (261.63 Hz) sine wave with subtle vibrato")
     print("- E4 (329.63 Hz) triangle wave with amplitude shimmer")
     print("- G4 (392.00 Hz) square wave with pulse width modulation")
-    chord_output.start(duration=10)
+    play(chord_output, 10, wav_path)
 
 
-def example_3_vca():
+def example_3_vca(wav_path=None):
     """Demonstrate VCA capabilities with tremolo and envelope effects."""
     # Create a base tone with two oscillators
     base_tone = SineOscillator(frequency=440)  # A4
@@ -121,14 +178,14 @@ def example_3_vca():
     # Create audio output
     vca_output = AudioOutput(vca_filter)
 
-    print("Playing VCA demonstration...")
+    announce("VCA demonstration", wav_path)
     print("- Base tone: 440 Hz sine + 880 Hz triangle")
     print("- Fast tremolo effect at 6 Hz")
     print("- Slow volume envelope at 0.1 Hz")
-    vca_output.start(duration=10)
+    play(vca_output, 10, wav_path)
 
 
-def example_4_beeper():
+def example_4_beeper(wav_path=None):
     """Demonstrate VCA as an on/off gate to create a beeping sound."""
     # Create a simple tone using a square wave
     tone = SquareOscillator(frequency=500, amplitude=0.7)  # A5 note
@@ -148,13 +205,13 @@ def example_4_beeper():
     # Create audio output
     output = AudioOutput(filter_module)
 
-    print("Playing beeper demonstration...")
+    announce("beeper demonstration", wav_path)
     print("- 880 Hz square wave")
     print("- Gated on/off at 2 Hz (2 beeps per second)")
-    output.start(duration=5)
+    play(output, 5, wav_path)
 
 
-def example_5_morse_code():
+def example_5_morse_code(wav_path=None):
     """Demonstrate VCA as a gate to create morse code pattern for 'SOS'."""
     # Create a simple tone
     tone = SineOscillator(frequency=660, amplitude=0.7)  # E5 note
@@ -195,14 +252,14 @@ def example_5_morse_code():
     # Create audio output
     output = AudioOutput(filter_module)
 
-    print("Playing Morse code demonstration...")
+    announce("Morse code demonstration", wav_path)
     print("- 660 Hz sine wave")
     print("- Gated to produce SOS pattern")
     print("- ... --- ...")
-    output.start(duration=10)
+    play(output, 10, wav_path)
 
 
-def example_6_drum_and_lead():
+def example_6_drum_and_lead(wav_path=None):
     """Demonstrate a simple drum pattern with a lead synth melody."""
     # Create drum sounds using filtered noise
     kick = SquareOscillator(frequency=60, amplitude=0.5)  # Low frequency for kick
@@ -258,15 +315,15 @@ def example_6_drum_and_lead():
     # Create audio output
     output = AudioOutput(drum_filter)
 
-    print("Playing drum and lead demonstration...")
+    announce("drum and lead demonstration", wav_path)
     print("- Kick drum on the 1")
     print("- Snare on the 2 and 4")
     print("- Hihat on eighth notes")
     print("- Lead synth playing quarter notes")
-    output.start(duration=10)
+    play(output, 10, wav_path)
 
 
-def example_7_sequencer():
+def example_7_sequencer(wav_path=None):
     """Demonstrate the sequencer with a simple melody."""
     # Create a rich lead sound using multiple oscillators
     lead_fundamental = SineOscillator(frequency=440, amplitude=0.3)
@@ -312,7 +369,52 @@ def example_7_sequencer():
     # Create audio output
     output = AudioOutput(filter_module)
 
-    print("Playing sequencer demonstration...")
+    announce("sequencer demonstration", wav_path)
     print("- Twinkle Twinkle Little Star melody")
     print("- Rich lead sound with multiple oscillators")
-    output.start(duration=20)  # Longer duration to play the full melody
+    # The melody is fixed, so it is only synthesized on the first run
+    samples = cached_render("example_7_sequencer", output, duration=20)
+    play(AudioOutput.from_buffer(samples), 20, wav_path)
+
+
+# Examples by number, for running from the command line
+EXAMPLES = {
+    "1": example_1_waveforms,
+    "2": example_2_chord,
+    "3": example_3_vca,
+    "4": example_4_beeper,
+    "5": example_5_morse_code,
+    "6": example_6_drum_and_lead,
+    "7": example_7_sequencer,
+}
+
+
+def main(argv: list[str]) -> None:
+    """Play the examples numbered in argv, in order, or example 7 by default."""
+    parser = argparse.ArgumentParser(description="Play the bleeps examples.")
+    # No choices=: argparse checks an empty list against them, which fails on
+    # a dict, so unknown numbers are rejected below instead
+    parser.add_argument(
+        "examples", nargs="*", default=None, help=f"any of {', '.join(EXAMPLES)}"
+    )
+    parser.add_argument(
+        "--wav",
+        metavar="DIR",
+        type=Path,
+        help="write each example to DIR/<example name>.wav instead of playing it",
+    )
+    args = parser.parse_args(argv)
+    numbers = args.examples or ["7"]
+    for number in numbers:
+        if number not in EXAMPLES:
+            parser.error(f"unknown example {number!r}")
+
+    if args.wav:
+        args.wav.mkdir(parents=True, exist_ok=True)
+    for number in numbers:
+        example = EXAMPLES[number]
+        example(args.wav / f"{example.__name__}.wav" if args.wav else None)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])